@@ -3,6 +3,7 @@ API Gateway Service
 Handles authentication, routing, and frontend serving
 """
 import base64
+import hmac
 import os
 import re
 import secrets
@@ -213,7 +214,7 @@ async def lifespan(app: FastAPI):
                 secrets_source = "environment"
 
         if not session_key_bytes:
-            logger.warning("Session key not found; generating ephemeral key (sessions reset on restart)")
+            logger.warning("Session key not found; generating ephemeral key (a restart invalidates sessions even with SESSION_STORE=redis)")
             session_key_bytes = secrets.token_bytes(32)
             secrets_source = "ephemeral"
         else:
@@ -389,6 +390,13 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
 
 app.add_middleware(SecurityHeadersMiddleware)
 
+def _tokens_match(supplied: Optional[str], expected: Optional[str]) -> bool:
+    """Constant-time comparison of a client-supplied token against the expected value"""
+    if not supplied or not expected:
+        return False
+    return hmac.compare_digest(supplied.encode("utf-8"), expected.encode("utf-8"))
+
+
 # CSRF enforcement middleware (double-submit cookie)
 class CSRFMiddleware(BaseHTTPMiddleware):
     def __init__(self, app):
@@ -488,7 +496,7 @@ class CSRFMiddleware(BaseHTTPMiddleware):
                 # Double-submit CSRF check for web clients
                 header_token = request.headers.get(CSRF_HEADER_NAME)
                 cookie_token = request.cookies.get(CSRF_COOKIE_NAME)
-                if not header_token or not cookie_token or header_token != cookie_token or header_token != session.csrf_token:
+                if not (_tokens_match(header_token, cookie_token) and _tokens_match(header_token, session.csrf_token)):
                     self.logger.warning(
                         "[CSRF] invalid token path=%s rid=%s header=%s cookie=%s session=%s",
                         request.url.path,
@@ -1,30 +1,47 @@
 """
 Enhanced Authentication and Authorization System
-Role-based access control with speaker-based data isolation, encrypted sessions, and persistent storage
+Role-based access control with speaker-based data isolation, server-side sessions behind opaque tokens, and persistent storage
 """
 
 import os
+import re
 import secrets
 import hashlib
+import heapq
 import time
+import threading
 import bcrypt
+import msgpack
+from argon2 import PasswordHasher
 import sqlite3
-import json
-import base64
-from typing import Optional, Dict, List
-from dataclasses import dataclass, asdict
+import hmac
+from collections import OrderedDict
+from typing import Optional, Dict, List, Tuple, Protocol
+from dataclasses import dataclass, asdict, replace
 from enum import Enum
 from pathlib import Path
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import padding as sym_padding
-from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from shared.crypto.db_encryption import create_encrypted_db
+
+# Optional Redis import (session store falls back to in-memory if unavailable)
+try:
+    import redis  # type: ignore
+except Exception:  # pragma: no cover - import fallback
+    redis = None
 
 class UserRole(str, Enum):
     ADMIN = "admin"  # Full system access, sees all transcripts
     USER = "user"    # Limited access, sees only own transcripts (speaker-based isolation)
 
-@dataclass
+# Role hierarchy: admin > user
+_ROLE_LEVEL = {
+    UserRole.USER: 1,
+    UserRole.ADMIN: 2
+}
+
+# Stored role string -> enum member; one dict lookup instead of Enum.__call__
+_ROLE_FROM_STR = {role.value: role for role in UserRole}
+
+@dataclass(slots=True, frozen=True)
 class User:
     user_id: str
     username: str
@@ -35,7 +52,7 @@ class User:
     created_at: Optional[float] = None
     modified_at: Optional[float] = None
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Session:
     session_token: str
     user_id: str
@@ -46,133 +63,290 @@ class Session:
     ip_address: Optional[str] = None
     last_refresh: Optional[float] = None
     csrf_token: Optional[str] = None
+    username: Optional[str] = None  # Copied from User at login so get_user_info skips the DB
+    email: Optional[str] = None
 
-def _env_flag(var_name: str, default: bool) -> bool:
-    value = os.getenv(var_name)
-    if value is None:
-        return default
-    return value.strip().lower() in {"1", "true", "yes"}
+# Stored payload fields; unknown keys (e.g. written by a newer worker) are ignored on read
+_SESSION_FIELDS = frozenset(Session.__slots__) - {"session_token"}
 
 
-SESSION_TOKEN_ENABLE_V2 = _env_flag("SESSION_TOKEN_ENABLE_V2", True)
-SESSION_TOKEN_EMIT_V2 = _env_flag("SESSION_TOKEN_EMIT_V2", True)
-SESSION_TOKEN_ACCEPT_V1 = _env_flag("SESSION_TOKEN_ACCEPT_V1", True)
+def _pack_session(data: Dict) -> bytes:
+    """Serialize session payload as msgpack"""
+    return msgpack.packb(data, use_bin_type=True)
 
 
-class SessionEncryption:
-    """Handles AES-256 encryption/decryption of session tokens"""
+def _unpack_session(plaintext: bytes) -> Dict:
+    """Deserialize a msgpack session payload"""
+    return msgpack.unpackb(plaintext, raw=False)
+
+
+class SessionStore(Protocol):
+    """Backend holding live sessions keyed by session token"""
     
-    def __init__(self, secret_key: bytes):
-        """Initialize with 32-byte secret key"""
-        if len(secret_key) != 32:
-            raise ValueError("Secret key must be exactly 32 bytes")
-        self.key = secret_key
-        self.backend = default_backend()
+    def get(self, session_token: str) -> Optional[Session]:
+        """Return the unexpired session for token, or None"""
+        ...
     
-    def encrypt(self, data: Dict) -> str:
-        """Encrypt session data and return base64-encoded token"""
-        # Convert dict to JSON
-        plaintext = json.dumps(data).encode('utf-8')
-        
-        # Pad data to AES block size
-        padder = sym_padding.PKCS7(128).padder()
-        padded_data = padder.update(plaintext) + padder.finalize()
-        
-        # Generate random IV
-        iv = secrets.token_bytes(16)
-        
-        # Encrypt
-        cipher = Cipher(algorithms.AES(self.key), modes.CBC(iv), backend=self.backend)
-        encryptor = cipher.encryptor()
-        ciphertext = encryptor.update(padded_data) + encryptor.finalize()
-        
-        # Combine IV + ciphertext and encode
-        combined = iv + ciphertext
-        return base64.urlsafe_b64encode(combined).decode('utf-8')
+    def set(self, session_token: str, session: Session, ttl: float) -> bool:
+        """Store session for ttl seconds; returns False if the backend could not persist it"""
+        ...
     
-    def decrypt(self, token: str) -> Optional[Dict]:
-        """Decrypt base64-encoded token and return session data"""
-        try:
-            # Decode from base64
-            combined = base64.urlsafe_b64decode(token.encode('utf-8'))
-            
-            # Split IV and ciphertext
-            iv = combined[:16]
-            ciphertext = combined[16:]
-            
-            # Decrypt
-            cipher = Cipher(algorithms.AES(self.key), modes.CBC(iv), backend=self.backend)
-            decryptor = cipher.decryptor()
-            padded_data = decryptor.update(ciphertext) + decryptor.finalize()
-            
-            # Unpad
-            unpadder = sym_padding.PKCS7(128).unpadder()
-            plaintext = unpadder.update(padded_data) + unpadder.finalize()
-            
-            # Parse JSON
-            return json.loads(plaintext.decode('utf-8'))
-        except Exception as e:
-            print(f"[AUTH] Token decryption failed: {e}")
-            return None
+    def delete(self, session_token: str) -> bool:
+        """Remove session; returns whether it was present"""
+        ...
+    
+    def cleanup(self) -> int:
+        """Drop expired sessions; returns how many were removed"""
+        ...
 
 
-class SessionEncryptionV2:
-    """AES-GCM (AEAD) session tokens with explicit v2 prefix."""
+def _store_digest_key(secret_key: Optional[bytes]) -> bytes:
+    """Key for session-store digests; an ephemeral key only works within one process"""
+    if secret_key is None:
+        return secrets.token_bytes(32)
+    if len(secret_key) != 32:
+        raise ValueError("Secret key must be exactly 32 bytes")
+    return secret_key
 
-    PREFIX = "v2."
 
-    def __init__(self, secret_key: bytes):
-        if len(secret_key) != 32:
-            raise ValueError("Secret key must be exactly 32 bytes")
-        self.aead = AESGCM(secret_key)
+class InMemoryStore:
+    """Process-local session store (one cache per worker)"""
+    
+    def __init__(self, secret_key: Optional[bytes] = None):
+        self._digest_key = _store_digest_key(secret_key)
+        # Keyed by a 16-byte keyed blake2b digest of the token rather than the token string
+        self.sessions: Dict[bytes, Session] = {}
+        # digest -> expires_at, kept alongside self.sessions for the get() fast path
+        self._exp: Dict[bytes, float] = {}
+        # (expires_at, digest) min-heap so cleanup only touches already-expired entries
+        self._exp_heap: List[Tuple[float, bytes]] = []
+        # Wall-clock offset so expiry checks can use the cheaper monotonic clock
+        self._wall_offset = time.time() - time.monotonic()
+    
+    def _k(self, session_token: str) -> bytes:
+        return hashlib.blake2b(session_token.encode('utf-8'), digest_size=16, key=self._digest_key).digest()
+    
+    def get(self, session_token: str) -> Optional[Session]:
+        # Fast path: one expiry lookup + one float compare
+        key = self._k(session_token)
+        expires_at = self._exp.get(key)
+        if expires_at is None:
+            return None
+        if expires_at > time.monotonic() + self._wall_offset:
+            return self.sessions[key]
+        self._delete_key(key)
+        return None
+    
+    def set(self, session_token: str, session: Session, ttl: float) -> bool:
+        key = self._k(session_token)
+        self.sessions[key] = session
+        self._exp[key] = session.expires_at
+        heapq.heappush(self._exp_heap, (session.expires_at, key))
+        self._maybe_compact()
+        return True
+    
+    def delete(self, session_token: str) -> bool:
+        removed = self._delete_key(self._k(session_token))
+        self._maybe_compact()
+        return removed
+    
+    def _delete_key(self, key: bytes) -> bool:
+        self._exp.pop(key, None)
+        return self.sessions.pop(key, None) is not None
+    
+    def _maybe_compact(self):
+        # Deletes and re-stores leave stale heap entries behind; rebuild from the live map once
+        # they outnumber live sessions so logouts free memory without waiting for cleanup()
+        if len(self._exp_heap) > 2 * len(self._exp) + 64:
+            self._exp_heap = [(expires_at, key) for key, expires_at in self._exp.items()]
+            heapq.heapify(self._exp_heap)
+    
+    def cleanup(self) -> int:
+        now = time.time()
+        removed = 0
+        heap = self._exp_heap
+        while heap and heap[0][0] < now:
+            expires_at, key = heapq.heappop(heap)
+            # Skip stale heap entries (session deleted or re-stored with a new expiry)
+            if self._exp.get(key) == expires_at:
+                self._delete_key(key)
+                removed += 1
+        # Compact once afterwards; rebuilding mid-loop would swap the heap being popped
+        self._maybe_compact()
+        return removed
 
-    def encrypt(self, data: Dict) -> str:
-        plaintext = json.dumps(data).encode("utf-8")
-        nonce = secrets.token_bytes(12)
-        ciphertext = self.aead.encrypt(nonce, plaintext, None)
-        combined = nonce + ciphertext
-        token = base64.urlsafe_b64encode(combined).decode("utf-8").rstrip("=")
-        return f"{self.PREFIX}{token}"
 
-    def decrypt(self, token: str) -> Optional[Dict]:
-        if not token.startswith(self.PREFIX):
+class RedisStore:
+    """Session store shared across workers; expiry is enforced by Redis EXPIRE
+    
+    A small per-process LRU (L1) sits in front of Redis so hot sessions skip the
+    network round-trip. L1 entries live for at most local_ttl seconds, which bounds
+    how long a logout on another worker can take to be seen here. Well-formed tokens
+    that Redis has already reported missing are remembered in a bounded negative
+    cache so replayed junk does not cost a round-trip each time.
+    
+    Values carry an HMAC-SHA256 tag bound to their key, so a client that can write to
+    Redis but lacks the secret cannot forge or edit sessions (e.g. raise role to admin).
+    It can still delete them or replay a value under the same key until it expires.
+    """
+    
+    KEY_PREFIX = "sess:"
+    _TAG_SIZE = 32
+    
+    def __init__(
+        self,
+        secret_key: bytes,
+        url: Optional[str] = None,
+        client=None,
+        local_ttl: float = 5.0,
+        local_size: int = 4096,
+        rejected_size: int = 65536
+    ):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("redis package not installed")
+            url = url or os.getenv("REDIS_URL", "redis://redis:6379/0")
+            client = redis.Redis(connection_pool=redis.ConnectionPool.from_url(url))
+        self._client = client
+        # Workers must share the key to agree on Redis keys, so no ephemeral fallback here
+        if secret_key is None:
+            raise ValueError("RedisStore requires the shared session secret key")
+        self._digest_key = _store_digest_key(secret_key)
+        self._local: "OrderedDict[str, Tuple[float, Session]]" = OrderedDict()
+        self._local_ttl = local_ttl
+        self._local_size = local_size
+        self._local_lock = threading.Lock()
+        # Keys Redis answered "missing" for; opaque random tokens never become valid later
+        self._rejected: "OrderedDict[str, None]" = OrderedDict()
+        self._rejected_size = rejected_size
+    
+    def _key(self, session_token: str) -> str:
+        # Keyed digest so the raw bearer token never reaches Redis
+        digest = hmac.new(self._digest_key, session_token.encode('utf-8'), hashlib.sha256).hexdigest()
+        return self.KEY_PREFIX + digest
+    
+    def _tag(self, key: str, payload: bytes) -> bytes:
+        return hmac.new(self._digest_key, key.encode('utf-8') + b"\0" + payload, hashlib.sha256).digest()
+    
+    def _seal(self, key: str, payload: bytes) -> bytes:
+        """Prefix payload with its tag for storage under key"""
+        return self._tag(key, payload) + payload
+    
+    def _open(self, key: str, raw: bytes) -> bytes:
+        """Return the payload of a sealed value, raising ValueError if the tag does not match"""
+        tag, payload = raw[:self._TAG_SIZE], raw[self._TAG_SIZE:]
+        if not hmac.compare_digest(tag, self._tag(key, payload)):
+            raise ValueError("session payload failed authentication")
+        return payload
+    
+    def get(self, session_token: str) -> Optional[Session]:
+        key = self._key(session_token)
+        now = time.time()
+        with self._local_lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic() and entry[1].expires_at > now:
+                    self._local.move_to_end(key)
+                    return entry[1]
+                del self._local[key]
+            if key in self._rejected:
+                return None
+        
+        try:
+            raw = self._client.get(key)
+        except Exception as e:
+            print(f"[AUTH] Redis session lookup failed: {e}")
+            return None
+        if not raw:
+            with self._local_lock:
+                self._rejected[key] = None
+                if len(self._rejected) > self._rejected_size:
+                    self._rejected.popitem(last=False)
             return None
-        body = token[len(self.PREFIX) :]
-        padding = "=" * (-len(body) % 4)
         try:
-            raw = base64.urlsafe_b64decode(body + padding)
-            nonce, ciphertext = raw[:12], raw[12:]
-            plaintext = self.aead.decrypt(nonce, ciphertext, None)
-            return json.loads(plaintext.decode("utf-8"))
-        except Exception as exc:
-            print(f"[AUTH] v2 token rejection: {exc}")
+            data = {k: v for k, v in _unpack_session(self._open(key, raw)).items() if k in _SESSION_FIELDS}
+            data["role"] = _ROLE_FROM_STR[data["role"]]
+            session = Session(session_token=session_token, **data)
+        except Exception as e:
+            # Corrupt or incompatible payload: treat as a miss rather than failing the request
+            print(f"[AUTH] Discarding unreadable Redis session: {e}")
             return None
+        if session.expires_at <= now:
+            return None
+        self._remember(key, session)
+        return session
+    
+    def set(self, session_token: str, session: Session, ttl: float) -> bool:
+        data = asdict(session)
+        del data["session_token"]
+        data["role"] = session.role.value
+        key = self._key(session_token)
+        try:
+            self._client.set(key, self._seal(key, _pack_session(data)), ex=max(1, int(ttl)))
+        except Exception as e:
+            print(f"[AUTH] Redis session store failed: {e}")
+            return False
+        self._remember(key, session)
+        return True
+    
+    def delete(self, session_token: str) -> bool:
+        key = self._key(session_token)
+        with self._local_lock:
+            self._local.pop(key, None)
+        try:
+            return bool(self._client.delete(key))
+        except Exception as e:
+            print(f"[AUTH] Redis session delete failed: {e}")
+            return False
+    
+    def cleanup(self) -> int:
+        # Redis expires keys itself
+        return 0
+    
+    def _remember(self, key: str, session: Session):
+        with self._local_lock:
+            self._local[key] = (time.monotonic() + self._local_ttl, session)
+            self._local.move_to_end(key)
+            if len(self._local) > self._local_size:
+                self._local.popitem(last=False)
 
 
-class SessionTokenCodec:
-    """Encodes/decodes session tokens with compatibility flags."""
+def create_session_store(secret_key: Optional[bytes] = None) -> SessionStore:
+    """Build the session store selected by SESSION_STORE (memory|redis)"""
+    backend = os.getenv("SESSION_STORE", "memory").strip().lower()
+    if backend == "redis":
+        try:
+            store = RedisStore(secret_key)
+            store._client.ping()
+            print("[AUTH] Session store: Redis")
+            return store
+        except Exception as e:
+            print(f"[AUTH] WARNING: Redis session store unavailable, falling back to in-memory: {e}")
+    print("[AUTH] Session store: in-memory (per worker; sessions reset on restart)")
+    return InMemoryStore(secret_key)
 
-    def __init__(self, secret_key: bytes):
-        self.v1 = SessionEncryption(secret_key)
-        self.enable_v2 = SESSION_TOKEN_ENABLE_V2
-        self.emit_v2 = self.enable_v2 and SESSION_TOKEN_EMIT_V2
-        self.accept_v1 = SESSION_TOKEN_ACCEPT_V1 or not self.enable_v2
-        self.v2 = SessionEncryptionV2(secret_key) if self.enable_v2 else None
-        print(f"[AUTH] Session tokens: emit_v2={self.emit_v2} accept_v1={self.accept_v1}")
 
-    def encode(self, data: Dict) -> str:
-        if self.emit_v2 and self.v2:
-            return self.v2.encrypt(data)
-        return self.v1.encrypt(data)
+SESSION_TOKEN_BYTES = 32  # Entropy of opaque session tokens
+# token_urlsafe(n) yields ceil(4n/3) unpadded base64url characters
+_SESSION_TOKEN_RE = re.compile(r"[A-Za-z0-9_-]{%d}" % -(-4 * SESSION_TOKEN_BYTES // 3))
+VERIFY_CACHE_SIZE = 1024  # Max memoized bcrypt verifications
+# Seconds before a cached User is re-read (picks up writes from other workers). Password checks
+# always read the row fresh, so the cache only serves session-side lookups such as get_user_by_id
+USER_CACHE_TTL = 60.0
+# argon2id parameters, tuned so a verify costs about as much as bcrypt cost 12. Unknown users,
+# migrated accounts and not-yet-migrated bcrypt accounts then all answer in the same time
+ARGON2_TIME_COST = 4
+ARGON2_MEMORY_COST = 65536  # KiB
 
-    def decode(self, token: str) -> Optional[Dict]:
-        if token.startswith(SessionEncryptionV2.PREFIX):
-            if not self.enable_v2 or not self.v2:
-                return None
-            return self.v2.decrypt(token)
-        if self.accept_v1:
-            return self.v1.decrypt(token)
-        return None
+# Users table queries, kept constant so sqlite3's statement cache always hits.
+# Rows are plain tuples (no sqlite3.Row); column order matches the User dataclass fields.
+_USER_COLUMNS = "user_id, username, password_hash, role, speaker_id, email, created_at, modified_at"
+_SQL_GET_BY_NAME = f"SELECT {_USER_COLUMNS} FROM users WHERE username = ?"
+_SQL_GET_BY_ID = f"SELECT {_USER_COLUMNS} FROM users WHERE user_id = ?"
+_SQL_SAVE_USER = f"INSERT OR REPLACE INTO users ({_USER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+_SQL_SEED_USER = f"INSERT OR IGNORE INTO users ({_USER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+_LIST_USER_COLUMNS = ("user_id", "username", "role", "speaker_id", "email", "created_at", "modified_at")
+_SQL_LIST_USERS = f"SELECT {', '.join(_LIST_USER_COLUMNS)} FROM users"
 
 ENABLE_DEMO_USERS = os.environ.get("ENABLE_DEMO_USERS", "false").strip().lower() in {"1", "true", "yes"}
 
@@ -186,20 +360,21 @@ class AuthManager:
                  session_duration_hours: int = 24,
                  refresh_interval_hours: int = 1,
                  create_default_users: Optional[bool] = None,
-                 db_encryption_key: Optional[str] = None):
+                 db_encryption_key: Optional[str] = None,
+                 session_store: Optional[SessionStore] = None):
         """
         Initialize auth manager with persistent database
         
         Args:
             db_path: Path to SQLite database for user storage
-            secret_key: 32-byte key for session encryption (generated if not provided)
+            secret_key: 32-byte key shared by all workers for session store keys (generated if not provided)
             session_duration_hours: Session validity duration
             refresh_interval_hours: Token refresh interval
+            session_store: Session backend (defaults to create_session_store())
         """
         self.db_path = db_path
         self.session_duration = session_duration_hours * 3600
         self.refresh_interval = refresh_interval_hours * 3600
-        from shared.crypto.db_encryption import create_encrypted_db
         self._db = create_encrypted_db(
             db_path=db_path,
             encryption_key=db_encryption_key,
@@ -209,16 +384,37 @@ class AuthManager:
             print("[AUTH] Users database encryption ENABLED (SQLCipher)")
         else:
             print("[AUTH] Users database encryption DISABLED")
-        
-        # Initialize encryption
+        # One long-lived users DB connection per thread (opened lazily by _conn)
+        self._conn_local = threading.local()
+        
+        # Memoized bcrypt results keyed by (HMAC(process key, password), password_hash). The random
+        # per-process key keeps the cache from holding fast, offline-crackable password digests
+        self._verify_cache: "OrderedDict[Tuple[bytes, str], bool]" = OrderedDict()
+        self._verify_key = secrets.token_bytes(32)
+        self._verify_lock = threading.Lock()
+        # argon2id for new hashes; legacy bcrypt hashes are upgraded on successful login
+        self._ph = PasswordHasher(time_cost=ARGON2_TIME_COST, memory_cost=ARGON2_MEMORY_COST, parallelism=1)
+        # Reference hash checked against for unknown usernames (timing-attack defense)
+        self._dummy_hash = self._hash_password("dummy")
+        
+        # Write-through user cache: key -> (monotonic expiry, User)
+        self._user_cache_by_name: Dict[str, Tuple[float, User]] = {}
+        self._user_cache_by_id: Dict[str, Tuple[float, User]] = {}
+        # Bumped on every invalidation; a load only caches if no write landed since its SELECT began
+        self._user_cache_gen = 0
+        self._user_cache_lock = threading.Lock()
+        
+        # Session store key
         if secret_key is None:
             # Generate and print warning - in production, load from env
             secret_key = secrets.token_bytes(32)
             print(f"[AUTH] WARNING: Generated ephemeral secret key. Set SECRET_KEY in environment for persistence!")
-        self.token_codec = SessionTokenCodec(secret_key)
         
-        # In-memory sessions (could be moved to Redis for distributed systems)
-        self.sessions: Dict[str, Session] = {}
+        # Authoritative live sessions; tokens are opaque random references into this store
+        # (in-memory per worker by default, Redis to share across workers)
+        self.session_store: SessionStore = (
+            session_store if session_store is not None else create_session_store(secret_key)
+        )
         
         # Initialize database
         self._init_database()
@@ -234,86 +430,73 @@ class AuthManager:
         """Create users table if it doesn't exist"""
         Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
         
-        conn = self._db.connect()
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                user_id TEXT PRIMARY KEY,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                role TEXT NOT NULL,
-                speaker_id TEXT,
-                email TEXT,
-                created_at REAL NOT NULL,
-                modified_at REAL NOT NULL
-            )
-        """)
-        conn.commit()
-        conn.close()
+        conn = self._conn()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    user_id TEXT PRIMARY KEY,
+                    username TEXT UNIQUE NOT NULL,
+                    password_hash TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    speaker_id TEXT,
+                    email TEXT,
+                    created_at REAL NOT NULL,
+                    modified_at REAL NOT NULL
+                )
+            """)
         print(f"[AUTH] Database initialized at {self.db_path}")
     
     def _create_default_users(self):
-        """Create default users if they don't exist"""
+        """Create default users if they don't exist (single query + single transaction)"""
         if not self._create_demo_users:
             return
         now = time.time()
         
+        # (username, password, role, speaker_id, email)
         default_users = [
-            User(
-                user_id="admin",
-                username="admin",
-                password_hash=self._hash_password("admin123"),  # CHANGE IN PRODUCTION
-                role=UserRole.ADMIN,
-                speaker_id=None,  # Admin sees all speakers
-                email="admin@nemoserver.local",
-                created_at=now,
-                modified_at=now
-            ),
-            User(
-                user_id="user1",
-                username="user1",
-                password_hash=self._hash_password("user1pass"),
-                role=UserRole.USER,
-                speaker_id="user1",  # Only sees "user1" speaker transcripts
-                email="user1@nemoserver.local",
-                created_at=now,
-                modified_at=now
-            ),
-            User(
-                user_id="television",
-                username="television",
-                password_hash=self._hash_password("tvpass123"),
-                role=UserRole.USER,
-                speaker_id="television",  # Only sees "television" speaker transcripts
-                email="television@nemoserver.local",
-                created_at=now,
-                modified_at=now
+            ("admin", "admin123", UserRole.ADMIN, None, "admin@nemoserver.local"),  # CHANGE IN PRODUCTION; admin sees all speakers
+            ("user1", "user1pass", UserRole.USER, "user1", "user1@nemoserver.local"),  # Only sees "user1" speaker transcripts
+            ("television", "tvpass123", UserRole.USER, "television", "television@nemoserver.local"),  # Only sees "television" speaker transcripts
+        ]
+        
+        conn = self._conn()
+        placeholders = ", ".join("?" for _ in default_users)
+        existing = {
+            row[0] for row in conn.execute(
+                f"SELECT username FROM users WHERE username IN ({placeholders})",
+                [username for username, *_ in default_users]
             )
+        }
+        missing = [seed for seed in default_users if seed[0] not in existing]
+        if not missing:
+            return
+        
+        # Only hash passwords for users that actually need creating (full argon2id cost each)
+        rows = [
+            (username, username, self._hash_password(password), role.value, speaker_id, email, now, now)
+            for username, password, role, speaker_id, email in missing
         ]
+        with conn:
+            conn.executemany(_SQL_SEED_USER, rows)
         
-        for user in default_users:
-            if not self.get_user(user.username):
-                self._save_user(user)
-                print(f"[AUTH] Created default user: {user.username} (role={user.role.value}, speaker={user.speaker_id})")
+        for username, _, role, speaker_id, _ in missing:
+            print(f"[AUTH] Created default user: {username} (role={role.value}, speaker={speaker_id})")
     
     def _save_user(self, user: User):
         """Save or update user in database"""
-        conn = self._db.connect()
-        conn.execute("""
-            INSERT OR REPLACE INTO users 
-            (user_id, username, password_hash, role, speaker_id, email, created_at, modified_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            user.user_id,
-            user.username,
-            user.password_hash,
-            user.role.value,
-            user.speaker_id,
-            user.email,
-            user.created_at,
-            user.modified_at
-        ))
-        conn.commit()
-        conn.close()
+        conn = self._conn()
+        with conn:
+            conn.execute(_SQL_SAVE_USER, (
+                user.user_id,
+                user.username,
+                user.password_hash,
+                user.role.value,
+                user.speaker_id,
+                user.email,
+                user.created_at,
+                user.modified_at
+            ))
+        self._invalidate_user(user)
 
     def create_user(
         self,
@@ -340,159 +523,180 @@ class AuthManager:
         self._save_user(user)
         return user
 
+    def _conn(self) -> sqlite3.Connection:
+        """Return this thread's persistent users DB connection, opening it on first use"""
+        conn = getattr(self._conn_local, "conn", None)
+        if conn is None:
+            db = create_encrypted_db(
+                db_path=self.db_path,
+                encryption_key=self._db.encryption_key,
+                use_encryption=self._db.use_encryption,
+                connect_kwargs={"check_same_thread": False}
+            )
+            conn = db.connect()  # journal_mode=WAL is applied by EncryptedDatabase
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA cache_size=-8000")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA mmap_size=134217728")
+            self._conn_local.db = db
+            self._conn_local.conn = conn
+        return conn
+
     def get_user(self, username: str) -> Optional[User]:
         """Load user from database"""
-        conn = self._db.connect()
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM users WHERE username = ?", (username,))
-        row = cur.fetchone()
-        conn.close()
-        
-        if not row:
-            return None
-        
-        return User(
-            user_id=row['user_id'],
-            username=row['username'],
-            password_hash=row['password_hash'],
-            role=UserRole(row['role']),
-            speaker_id=row['speaker_id'],
-            email=row['email'],
-            created_at=row['created_at'],
-            modified_at=row['modified_at']
-        )
+        cached = self._user_cache_by_name.get(username)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        return self._load_user(_SQL_GET_BY_NAME, username)
     
     def get_user_by_id(self, user_id: str) -> Optional[User]:
         """Load user by ID from database"""
-        conn = self._db.connect()
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
-        row = cur.fetchone()
-        conn.close()
-        
+        cached = self._user_cache_by_id.get(user_id)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        return self._load_user(_SQL_GET_BY_ID, user_id)
+    
+    def _load_user(self, sql: str, key: str) -> Optional[User]:
+        """Run a single-user SELECT and cache the hydrated result"""
+        gen = self._user_cache_gen
+        row = self._conn().execute(sql, (key,)).fetchone()
         if not row:
             return None
         
-        return User(
-            user_id=row['user_id'],
-            username=row['username'],
-            password_hash=row['password_hash'],
-            role=UserRole(row['role']),
-            speaker_id=row['speaker_id'],
-            email=row['email'],
-            created_at=row['created_at'],
-            modified_at=row['modified_at']
-        )
+        user = User(row[0], row[1], row[2], _ROLE_FROM_STR[row[3]], row[4], row[5], row[6], row[7])
+        self._cache_user(user, gen)
+        return user
+    
+    def _cache_user(self, user: User, gen: int):
+        """Cache user under both lookup keys unless it was invalidated after generation gen"""
+        entry = (time.monotonic() + USER_CACHE_TTL, user)
+        with self._user_cache_lock:
+            # A write committed while this row was being read; caching it would resurrect
+            # the old record (e.g. an old password hash) for USER_CACHE_TTL
+            if gen != self._user_cache_gen:
+                return
+            self._user_cache_by_name[user.username] = entry
+            self._user_cache_by_id[user.user_id] = entry
+    
+    def _invalidate_user(self, user: User):
+        """Drop cached entries for user (including a stale username for the same ID)"""
+        with self._user_cache_lock:
+            self._user_cache_gen += 1
+            stale = self._user_cache_by_id.pop(user.user_id, None)
+            if stale:
+                self._user_cache_by_name.pop(stale[1].username, None)
+            self._user_cache_by_name.pop(user.username, None)
     
     def list_users(self) -> List[Dict]:
         """List all users (without password hashes)"""
-        conn = self._db.connect()
-        conn.row_factory = sqlite3.Row
-        cur = conn.cursor()
-        cur.execute("SELECT user_id, username, role, speaker_id, email, created_at, modified_at FROM users")
-        rows = cur.fetchall()
-        conn.close()
-        
-        return [dict(row) for row in rows]
+        rows = self._conn().execute(_SQL_LIST_USERS).fetchall()
+        return [dict(zip(_LIST_USER_COLUMNS, row)) for row in rows]
     
     def _hash_password(self, password: str) -> str:
-        """Hash password using bcrypt with cost factor 12"""
-        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=12)).decode('utf-8')
+        """Hash password using argon2id"""
+        return self._ph.hash(password)
     
-    def _verify_password(self, password: str, password_hash: str) -> bool:
-        """Verify password against bcrypt hash"""
+    def _check_password_hash(self, password: str, password_hash: str) -> bool:
+        """Run the underlying argon2id or bcrypt check (never memoized)"""
         try:
+            if password_hash.startswith("$argon2"):
+                return self._ph.verify(password_hash, password)
             return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
         except Exception:
             return False
     
+    def _needs_rehash(self, password_hash: str) -> bool:
+        """Whether a stored hash should be upgraded (bcrypt -> argon2id, or stale argon2 params)"""
+        if not password_hash.startswith("$argon2"):
+            return True
+        return self._ph.check_needs_rehash(password_hash)
+    
+    def _verify_password(self, password: str, password_hash: str) -> bool:
+        """Verify password against stored hash (memoized per password/hash pair)"""
+        key = (hmac.new(self._verify_key, password.encode('utf-8'), hashlib.sha256).digest(), password_hash)
+        with self._verify_lock:
+            if key in self._verify_cache:
+                self._verify_cache.move_to_end(key)
+                return True
+        
+        result = self._check_password_hash(password, password_hash)
+        
+        # Only successes are memoized: failed guesses must keep paying full bcrypt cost so they
+        # stay indistinguishable from the unknown-user dummy check
+        if result:
+            with self._verify_lock:
+                self._verify_cache[key] = True
+                if len(self._verify_cache) > VERIFY_CACHE_SIZE:
+                    self._verify_cache.popitem(last=False)
+        return result
+    
+    def _evict_verify_cache(self, password_hash: str):
+        """Drop memoized verifications for a password hash that is no longer current"""
+        with self._verify_lock:
+            stale = [key for key in self._verify_cache if key[1] == password_hash]
+            for key in stale:
+                del self._verify_cache[key]
+    
     def authenticate(self, username: str, password: str, ip_address: Optional[str] = None) -> Optional[str]:
         """
-        Authenticate user and create encrypted session
-        Returns encrypted session token if successful, None otherwise
+        Authenticate user and create session
+        Returns opaque session token if successful, None otherwise
         """
-        user = self.get_user(username)
+        # Fresh read: a password changed on another worker must take effect at once, and one
+        # indexed SELECT is noise next to the hash check
+        user = self._load_user(_SQL_GET_BY_NAME, username)
         if not user:
-            # Prevent timing attacks
-            bcrypt.hashpw(b"dummy", bcrypt.gensalt())
+            # Prevent timing attacks: same cost as a real verify
+            self._check_password_hash(password, self._dummy_hash)
             return None
         
         if not self._verify_password(password, user.password_hash):
             return None
         
-        # Create session data
-        now = time.time()
-        csrf_token = secrets.token_hex(32)
-        session_data = {
-            "user_id": user.user_id,
-            "role": user.role.value,
-            "speaker_id": user.speaker_id,
-            "created_at": now,
-            "expires_at": now + self.session_duration,
-            "ip": ip_address,
-            "last_refresh": now,
-            "csrf_token": csrf_token
-        }
-        
-        # Encrypt session data to create token
-        session_token = self.token_codec.encode(session_data)
+        # Transparently migrate legacy bcrypt hashes now that we hold the plaintext
+        if self._needs_rehash(user.password_hash):
+            self._evict_verify_cache(user.password_hash)
+            user = replace(user, password_hash=self._hash_password(password), modified_at=time.time())
+            self._save_user(user)
+            print(f"[AUTH] Upgraded password hash for user '{username}' to argon2id")
         
-        # Store session in memory
+        session_token = self._mint_session(user, ip_address)
+        if session_token is None:
+            return None
+        print(f"[AUTH] User '{username}' authenticated (role={user.role.value}, speaker={user.speaker_id})")
+        return session_token
+    
+    def _mint_session(self, user: User, ip_address: Optional[str] = None) -> Optional[str]:
+        """Create and store a new session for an already-verified user; returns its token (None if not stored)"""
+        # Opaque random token; all session state lives server-side in the store
+        now = time.time()
+        session_token = secrets.token_urlsafe(SESSION_TOKEN_BYTES)
         session = Session(
             session_token=session_token,
             user_id=user.user_id,
             role=user.role,
             speaker_id=user.speaker_id,
             created_at=now,
-            expires_at=session_data["expires_at"],
+            expires_at=now + self.session_duration,
             ip_address=ip_address,
             last_refresh=now,
-            csrf_token=csrf_token
+            csrf_token=secrets.token_hex(32),
+            username=user.username,
+            email=user.email
         )
         
-        self.sessions[session_token] = session
-        
-        print(f"[AUTH] User '{username}' authenticated (role={user.role.value}, speaker={user.speaker_id})")
+        if not self.session_store.set(session_token, session, self.session_duration):
+            print(f"[AUTH] Could not store session for user '{user.username}'")
+            return None
         return session_token
     
     def validate_session(self, session_token: str) -> Optional[Session]:
-        """Validate encrypted session token and check expiration"""
-        # Check in-memory cache first
-        session = self.sessions.get(session_token)
-        if session:
-            # Check expiration
-            if time.time() > session.expires_at:
-                del self.sessions[session_token]
-                return None
-            return session
-        
-        # Decrypt and validate token
-        session_data = self.token_codec.decode(session_token)
-        if not session_data:
-            return None
-        
-        # Check expiration
-        if time.time() > session_data["expires_at"]:
+        """Look up session token and check expiration"""
+        # Structural check first: anything that is not a token we could have minted is
+        # rejected without hashing it or touching the session store
+        if not session_token or not _SESSION_TOKEN_RE.fullmatch(session_token):
             return None
-        
-        # Reconstruct session object
-        session = Session(
-            session_token=session_token,
-            user_id=session_data["user_id"],
-            role=UserRole(session_data["role"]),
-            speaker_id=session_data.get("speaker_id"),
-            created_at=session_data["created_at"],
-            expires_at=session_data["expires_at"],
-            ip_address=session_data.get("ip"),
-            last_refresh=session_data.get("last_refresh", session_data["created_at"]),
-            csrf_token=session_data.get("csrf_token")
-        )
-        
-        # Cache in memory
-        self.sessions[session_token] = session
-        return session
+        return self.session_store.get(session_token)
     
     def refresh_token(self, session_token: str, ip_address: Optional[str] = None) -> Optional[str]:
         """
@@ -514,22 +718,25 @@ class AuthManager:
         if not user:
             return None
         
+        # Create new session first (the valid current token already proves identity); if the
+        # store rejects it the caller keeps the old, still-valid token
+        new_token = self._mint_session(user, ip_address or session.ip_address)
+        if new_token is None:
+            return session_token
+        
         # Invalidate old token
         self.logout(session_token)
-        
-        # Create new session
-        return self.authenticate(user.username, user.password_hash, ip_address or session.ip_address)
+        return new_token
     
     def logout(self, session_token: str) -> bool:
         """End session and invalidate token"""
-        if session_token in self.sessions:
-            del self.sessions[session_token]
-            return True
-        return False
+        # A keyed store lookup never compares the supplied token against other live tokens, so it
+        # leaks no timing signal; anything that scans or matches tokens must use hmac.compare_digest
+        return self.session_store.delete(session_token)
     
     def change_password(self, username: str, old_password: str, new_password: str) -> bool:
         """Change user password with verification"""
-        user = self.get_user(username)
+        user = self._load_user(_SQL_GET_BY_NAME, username)
         if not user:
             return False
         
@@ -538,8 +745,8 @@ class AuthManager:
             return False
         
         # Hash new password
-        user.password_hash = self._hash_password(new_password)
-        user.modified_at = time.time()
+        self._evict_verify_cache(user.password_hash)
+        user = replace(user, password_hash=self._hash_password(new_password), modified_at=time.time())
         
         # Save to database
         self._save_user(user)
@@ -550,19 +757,7 @@ class AuthManager:
     def check_permission(self, session_token: str, required_role: UserRole) -> bool:
         """Check if session has required role or higher"""
         session = self.validate_session(session_token)
-        if not session:
-            return False
-        
-        # Role hierarchy: admin > user
-        role_levels = {
-            UserRole.USER: 1,
-            UserRole.ADMIN: 2
-        }
-        
-        user_level = role_levels.get(session.role, 0)
-        required_level = role_levels.get(required_role, 999)
-        
-        return user_level >= required_level
+        return session is not None and _ROLE_LEVEL[session.role] >= _ROLE_LEVEL[required_role]
     
     def get_user_info(self, session_token: str) -> Optional[Dict]:
         """Get user info from session"""
@@ -570,6 +765,16 @@ class AuthManager:
         if not session:
             return None
         
+        if session.username is not None:
+            return {
+                "user_id": session.user_id,
+                "username": session.username,
+                "role": session.role.value,
+                "speaker_id": session.speaker_id,
+                "email": session.email
+            }
+        
+        # Sessions stored before username/email were carried on Session
         user = self.get_user_by_id(session.user_id)
         if not user:
             return None
@@ -584,14 +789,10 @@ class AuthManager:
     
     def cleanup_expired_sessions(self):
         """Remove expired sessions (call periodically)"""
-        now = time.time()
-        expired = [token for token, session in self.sessions.items() if session.expires_at < now]
-        for token in expired:
-            del self.sessions[token]
-        
-        if expired:
-            print(f"[AUTH] Cleaned up {len(expired)} expired sessions")
-        return len(expired)
+        removed = self.session_store.cleanup()
+        if removed:
+            print(f"[AUTH] Cleaned up {removed} expired sessions")
+        return removed
 
 # Global auth manager instance
 # Secret key should be loaded from environment in production
@@ -602,6 +803,7 @@ def init_auth_manager(
     db_path: str = "/app/instance/users.db",
     create_default_users: Optional[bool] = None,
     db_encryption_key: Optional[str] = None,
+    session_store: Optional[SessionStore] = None,
 ):
     """Initialize global auth manager"""
     global auth_manager
@@ -610,6 +812,7 @@ def init_auth_manager(
         db_path=db_path,
         create_default_users=create_default_users,
         db_encryption_key=db_encryption_key,
+        session_store=session_store,
     )
     return auth_manager
 
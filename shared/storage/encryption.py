@@ -7,7 +7,6 @@ import base64
 import secrets
 from typing import Optional, Tuple
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-from cryptography.hazmat.backends import default_backend
 
 class DataEncryption:
     """AES-256-GCM encryption for database fields"""
@@ -0,0 +1,402 @@
+"""
+Auth Manager Tests
+Covers user storage, password checks and session lifecycle
+"""
+
+import dataclasses
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from shared.auth.auth_manager import (
+    AuthManager,
+    RedisStore,
+    UserRole,
+    _pack_session,
+    _unpack_session,
+)
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def manager(tmp_path):
+    mgr = AuthManager(
+        db_path=str(tmp_path / "users.db"),
+        secret_key=b"k" * 32,
+        create_default_users=False,
+    )
+    mgr.create_user("alice", "alice-pass", role=UserRole.USER, speaker_id="alice", email="alice@example.com")
+    return mgr
+
+
+def test_authenticate_and_validate_session(manager):
+    token = manager.authenticate("alice", "alice-pass", ip_address="127.0.0.1")
+    assert token
+
+    session = manager.validate_session(token)
+    assert session is not None
+    assert session.user_id == "alice"
+    assert session.role == UserRole.USER
+    assert session.speaker_id == "alice"
+
+
+def test_authenticate_rejects_bad_credentials(manager):
+    assert manager.authenticate("alice", "wrong") is None
+    assert manager.authenticate("nobody", "alice-pass") is None
+
+
+def test_logout_invalidates_session(manager):
+    token = manager.authenticate("alice", "alice-pass")
+    assert manager.logout(token) is True
+    assert manager.validate_session(token) is None
+    assert manager.logout(token) is False
+
+
+def test_connection_is_reused_per_thread(manager):
+    assert manager._conn() is manager._conn()
+
+    other = []
+    worker = threading.Thread(target=lambda: other.append(manager._conn()))
+    worker.start()
+    worker.join()
+    assert other[0] is not manager._conn()
+    assert manager.get_user("alice") is not None
+
+
+def test_list_users_omits_password_hash(manager):
+    users = manager.list_users()
+    assert [u["username"] for u in users] == ["alice"]
+    assert "password_hash" not in users[0]
+
+
+def test_verify_cache_is_evicted_on_password_change(manager):
+    old_hash = manager.get_user("alice").password_hash
+    assert manager.authenticate("alice", "alice-pass")
+    assert any(key[1] == old_hash for key in manager._verify_cache)
+
+    assert manager.change_password("alice", "alice-pass", "new-pass")
+    assert not any(key[1] == old_hash for key in manager._verify_cache)
+    assert manager.authenticate("alice", "alice-pass") is None
+    assert manager.authenticate("alice", "new-pass")
+
+
+def test_tokens_are_opaque_references(manager):
+    token = manager.authenticate("alice", "alice-pass")
+    assert "alice" not in token
+    assert manager.validate_session(token[:-1] + ("A" if token[-1] != "A" else "B")) is None
+
+
+def test_expired_session_is_dropped_from_cache(manager):
+    token = manager.authenticate("alice", "alice-pass")
+    store = manager.session_store
+    key = store._k(token)
+    assert store.sessions[key].session_token == token
+    store._exp[key] = 0.0
+
+    assert store.get(token) is None
+    assert key not in store.sessions
+    assert key not in store._exp
+
+
+def test_user_cache_is_written_through(manager):
+    user = manager.get_user("alice")
+    assert manager.get_user("alice") is user
+    assert manager.get_user_by_id("alice") is user
+
+    manager.change_password("alice", "alice-pass", "new-pass")
+    fresh = manager.get_user_by_id("alice")
+    assert fresh is not user
+    assert fresh is manager.get_user("alice")
+    assert manager._verify_password("new-pass", fresh.password_hash)
+
+
+def test_password_change_on_another_worker_takes_effect_immediately(manager):
+    other = AuthManager(db_path=manager.db_path, secret_key=b"k" * 32, create_default_users=False)
+    assert manager.get_user("alice") is manager.get_user("alice")  # cached here
+    assert other.change_password("alice", "alice-pass", "new-pass")
+
+    assert manager.authenticate("alice", "alice-pass") is None
+    assert manager.authenticate("alice", "new-pass")
+
+
+def test_user_read_racing_a_password_change_is_not_cached(manager, monkeypatch):
+    old_hash = manager.get_user("alice").password_hash
+    manager._invalidate_user(manager.get_user("alice"))
+    real_conn = manager._conn()
+    raced = []
+
+    class _RacingConn:
+        def __getattr__(self, name):
+            return getattr(real_conn, name)
+
+        def __enter__(self):
+            return real_conn.__enter__()
+
+        def __exit__(self, *exc):
+            return real_conn.__exit__(*exc)
+
+        def execute(self, sql, params=()):
+            cursor = real_conn.execute(sql, params)
+            if raced or not sql.startswith("SELECT"):
+                return cursor
+            # Read the old row, then let the password change commit before it is cached
+            row = cursor.fetchone()
+            raced.append(None)
+            raced[0] = manager.change_password("alice", "alice-pass", "new-pass")
+            return type("_Cursor", (), {"fetchone": lambda self: row})()
+
+    monkeypatch.setattr(manager, "_conn", lambda: _RacingConn())
+    assert manager.get_user("alice").password_hash == old_hash
+    assert raced == [True]
+
+    assert manager.get_user("alice").password_hash != old_hash
+    assert manager.authenticate("alice", "alice-pass") is None
+
+
+def test_default_users_are_seeded_once(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "users.db")
+    mgr = AuthManager(db_path=db_path, secret_key=b"k" * 32, create_default_users=True)
+    assert {u["username"] for u in mgr.list_users()} == {"admin", "user1", "television"}
+    assert mgr.get_user("admin").role == UserRole.ADMIN
+
+    hashed = []
+    original = AuthManager._hash_password
+    monkeypatch.setattr(AuthManager, "_hash_password", lambda self, pw: hashed.append(pw) or original(self, pw))
+    again = AuthManager(db_path=db_path, secret_key=b"k" * 32, create_default_users=True)
+    assert len(again.list_users()) == 3
+    assert hashed == ["dummy"]  # only the timing-defense reference hash
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+        self.gets = 0
+        self.fail_writes = False
+
+    def get(self, key):
+        self.gets += 1
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        if self.fail_writes:
+            raise ConnectionError("redis down")
+        self.data[key] = value
+        self.ttls[key] = ex
+
+    def delete(self, key):
+        return 1 if self.data.pop(key, None) is not None else 0
+
+
+def test_redis_store_shares_sessions_between_managers(tmp_path):
+    client = _FakeRedis()
+    kwargs = dict(db_path=str(tmp_path / "users.db"), secret_key=b"k" * 32, create_default_users=False)
+    first = AuthManager(session_store=RedisStore(b"k" * 32, client=client, local_ttl=0.0), **kwargs)
+    first.create_user("bob", "bob-pass")
+    second = AuthManager(session_store=RedisStore(b"k" * 32, client=client, local_ttl=0.0), **kwargs)
+
+    token = first.authenticate("bob", "bob-pass")
+    (key,) = client.data
+    assert key.startswith("sess:") and token not in key
+    assert 0 < client.ttls[key] <= 24 * 3600
+
+    session = second.session_store.get(token)
+    assert session is not None
+    assert session.user_id == "bob"
+    assert session.role == UserRole.USER
+
+    assert second.logout(token) is True
+    assert first.session_store.get(token) is None
+    assert first.cleanup_expired_sessions() == 0
+
+
+def test_redis_store_treats_unreadable_payloads_as_missing():
+    client = _FakeRedis()
+    store = RedisStore(b"k" * 32, client=client, local_ttl=0.0)
+    data = {"user_id": "bob", "role": "user", "speaker_id": None, "created_at": 1.0,
+            "expires_at": 9e12, "future_field": True}
+
+    for token, payload in (("A", b"\xc1 not msgpack"), ("B", _pack_session(data)),
+                           ("C", _pack_session({"user_id": "bob"}))):
+        key = store._key(token * 43)
+        client.data[key] = store._seal(key, payload)
+
+    assert store.get("A" * 43) is None
+    assert store.get("B" * 43).user_id == "bob"
+    assert store.get("C" * 43) is None
+
+
+def test_redis_store_rejects_tampered_sessions(manager):
+    client = _FakeRedis()
+    manager.session_store = RedisStore(b"k" * 32, client=client, local_ttl=0.0)
+    token = manager.authenticate("alice", "alice-pass")
+    (key,) = client.data
+    sealed = client.data[key]
+
+    data = _unpack_session(sealed[32:])
+    data["role"] = "admin"
+    client.data[key] = sealed[:32] + _pack_session(data)
+    assert manager.validate_session(token) is None
+
+    client.data[key] = _pack_session(data)
+    assert manager.validate_session(token) is None
+
+    client.data[key] = sealed
+    assert manager.validate_session(token).role == UserRole.USER
+
+
+def test_unstored_sessions_are_never_handed_out(manager, monkeypatch):
+    client = _FakeRedis()
+    manager.session_store = RedisStore(b"k" * 32, client=client, local_ttl=0.0)
+    token = manager.authenticate("alice", "alice-pass")
+
+    client.fail_writes = True
+    assert manager.authenticate("alice", "alice-pass") is None
+
+    monkeypatch.setattr(manager, "refresh_interval", 0)
+    assert manager.refresh_token(token) == token
+    assert manager.validate_session(token).user_id == "alice"
+
+
+def test_failed_verifications_are_not_memoized(manager):
+    assert manager.authenticate("alice", "wrong") is None
+    assert len(manager._verify_cache) == 0
+
+
+def test_user_and_session_are_immutable(manager):
+    token = manager.authenticate("alice", "alice-pass")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        manager.get_user("alice").password_hash = "x"
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        manager.validate_session(token).expires_at = 0.0
+
+
+def test_redis_store_serves_hot_sessions_from_local_cache(manager):
+    client = _FakeRedis()
+    manager.session_store = RedisStore(b"k" * 32, client=client)
+    token = manager.authenticate("alice", "alice-pass")
+
+    assert manager.validate_session(token).user_id == "alice"
+    assert client.gets == 0
+
+    assert manager.logout(token) is True
+    assert manager.validate_session(token) is None
+    assert client.gets == 1
+
+
+def test_check_permission_follows_role_hierarchy(manager):
+    manager.create_user("root", "root-pass", role=UserRole.ADMIN)
+    user_token = manager.authenticate("alice", "alice-pass")
+    admin_token = manager.authenticate("root", "root-pass")
+
+    assert manager.check_permission(user_token, UserRole.USER)
+    assert not manager.check_permission(user_token, UserRole.ADMIN)
+    assert manager.check_permission(admin_token, UserRole.ADMIN)
+    assert not manager.check_permission("missing", UserRole.USER)
+
+
+def test_cleanup_pops_only_expired_sessions(manager):
+    store = manager.session_store
+    live = manager.authenticate("alice", "alice-pass")
+    gone = manager.authenticate("alice", "alice-pass")
+    revoked = manager.authenticate("alice", "alice-pass")
+    manager.logout(revoked)
+
+    old = store.sessions[store._k(gone)]
+    store.set(gone, dataclasses.replace(old, expires_at=1.0), 0)
+    store.set(revoked, dataclasses.replace(old, session_token=revoked, expires_at=2.0), 0)
+    store.delete(revoked)
+
+    assert manager.cleanup_expired_sessions() == 1
+    assert store.get(live) is not None
+    assert store.get(gone) is None and store.get(revoked) is None
+    assert store._k(gone) not in store.sessions
+    assert manager.cleanup_expired_sessions() == 0
+
+
+def test_logout_does_not_grow_expiry_heap(manager):
+    store = manager.session_store
+    session = store.sessions[store._k(manager.authenticate("alice", "alice-pass"))]
+    for i in range(1000):
+        token = "t%d" % i
+        store.set(token, dataclasses.replace(session, session_token=token), 60)
+        store.delete(token)
+
+    assert len(store._exp) == 1
+    assert len(store._exp_heap) <= 2 * len(store._exp) + 64
+
+
+def test_get_user_info_is_served_from_session(manager, monkeypatch):
+    token = manager.authenticate("alice", "alice-pass")
+    monkeypatch.setattr(manager, "get_user_by_id", lambda user_id: pytest.fail("unexpected DB lookup"))
+
+    assert manager.get_user_info(token) == {
+        "user_id": "alice",
+        "username": "alice",
+        "role": "user",
+        "speaker_id": "alice",
+        "email": "alice@example.com",
+    }
+
+
+def test_legacy_bcrypt_hash_is_upgraded_on_login(manager):
+    import bcrypt
+
+    legacy = bcrypt.hashpw(b"alice-pass", bcrypt.gensalt(rounds=4)).decode("utf-8")
+    manager._save_user(dataclasses.replace(manager.get_user("alice"), password_hash=legacy))
+
+    assert manager.authenticate("alice", "alice-pass")
+    upgraded = manager.get_user("alice").password_hash
+    assert upgraded.startswith("$argon2id$")
+    assert manager.authenticate("alice", "alice-pass")
+    assert manager.authenticate("alice", "wrong") is None
+
+
+def test_unknown_user_costs_the_same_as_a_wrong_password(manager):
+    def cost(username):
+        best = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            assert manager.authenticate(username, "wrong") is None
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    # Same argon2 parameters on both paths, so timing cannot separate real usernames
+    params = lambda h: h.rsplit("$", 2)[0]
+    assert params(manager._dummy_hash) == params(manager.get_user("alice").password_hash)
+    assert 0.67 < cost("nobody") / cost("alice") < 1.5
+
+
+def test_refresh_token_rotates_without_password_check(manager, monkeypatch):
+    token = manager.authenticate("alice", "alice-pass")
+    assert manager.refresh_token(token) == token
+
+    monkeypatch.setattr(manager, "refresh_interval", 0)
+    monkeypatch.setattr(manager, "_verify_password", lambda *a: pytest.fail("refresh must not verify passwords"))
+    new_token = manager.refresh_token(token, ip_address="10.0.0.1")
+
+    assert new_token and new_token != token
+    assert manager.validate_session(token) is None
+    session = manager.validate_session(new_token)
+    assert session.user_id == "alice"
+    assert session.ip_address == "10.0.0.1"
+
+
+def test_malformed_and_replayed_tokens_skip_redis(manager):
+    client = _FakeRedis()
+    manager.session_store = RedisStore(b"k" * 32, client=client)
+
+    for junk in ("", "short", "x" * 2048, "!" * 43):
+        assert manager.validate_session(junk) is None
+    assert client.gets == 0
+
+    unknown = "A" * 43
+    assert manager.validate_session(unknown) is None
+    assert manager.validate_session(unknown) is None
+    assert client.gets == 1